@@ -1,16 +1,20 @@
 import logging
 import os
 import traceback
-from typing import Any
+from typing import Any, Mapping
 from urllib.parse import urlparse
 
 import gh_md_to_html
 from bson import ObjectId
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 
 import helper
 from db import ElectionDatabase
+from limiter import MemoryTokenBucketStore, MongoTokenBucketStore, RateLimiter
+from monitor import LoadMonitor
+from profiler import Profiler
+from scheduler import ElectionScheduler
 
 logging.basicConfig(
     level=logging.INFO,
@@ -135,11 +139,47 @@ def remove_election(_id: str):
         return jsonify(output), 200
 
 
+def render_election_snapshot(snapshot: Mapping[str, Any], ip_address: str) -> Response:
+    snapshot = dict(snapshot)
+    etag = snapshot.pop("etag")
+    snapshot["_id"] = str(snapshot["_id"])
+    if snapshot["anonymous"] and snapshot["creator"] != ip_address:
+        snapshot.pop("ballot_counts", None)
+        etag = f"{etag}-anonymous"
+    output = {
+        "status": True,
+        "message": "Election details fetched successfully.",
+        "data": snapshot,
+    }
+    response = jsonify(output)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = (
+        f"{'private' if snapshot['anonymous'] else 'public'}, max-age=31536000, immutable"
+    )
+    return response.make_conditional(request)
+
+
 @app.route("/viewElection/<_id>", methods=["GET"])
 def view_election(_id: str):
     ip_address = helper.get_request_ip_address(request)
     logging.info(f"Received request to view election with ID: {_id} from {ip_address}")
 
+    try:
+        snapshot = election_db.get_election_snapshot(_id)
+    except Exception as e:
+        stacktrace = traceback.format_exc()
+        logging.error(f"Error in fetching result snapshot - {_id}: {e}: {stacktrace}")
+        output = {
+            "status": False,
+            "message": f"Error occurred while fetching election with ID: {_id}",
+            "error": str(e),
+        }
+        return jsonify(output), 400
+
+    if snapshot is not None:
+        logging.info(f"Serving finalized election with ID: {_id} from result snapshot")
+        return render_election_snapshot(snapshot, ip_address)
+
     try:
         election = election_db.get_election_by_id(_id)
         if isinstance(election["_id"], ObjectId):
@@ -320,9 +360,57 @@ def remove_vote(_id: str):
     return jsonify(output), response_code
 
 
+@app.route("/admin/profiles", methods=["GET"])
+def view_profiles():
+    ip_address = helper.get_request_ip_address(request)
+    logging.info(f"Received request to view captured profiles from {ip_address}")
+
+    if not profiler.check_profile_token(request):
+        logging.warning(f"Unauthorized request to view captured profiles by {ip_address}")
+        output = {
+            "status": False,
+            "message": "You are not authorized to view captured profiles.",
+        }
+        return jsonify(output), 401
+
+    try:
+        profiles = profiler.list_profiles()
+        output = {
+            "status": True,
+            "message": "Captured profiles fetched successfully.",
+            "data": profiles,
+        }
+        response_code = 200
+    except Exception as e:
+        stacktrace = traceback.format_exc()
+        logging.error(f"Error in fetching captured profiles: {e}: {stacktrace}")
+        output = {
+            "status": False,
+            "message": "Error occurred while fetching captured profiles",
+            "error": str(e),
+        }
+        response_code = 400
+
+    return jsonify(output), response_code
+
+
 if __name__ == "__main__":
-    election_db = ElectionDatabase()
+    profiler = Profiler()
+    profiler.init_app(app)
+    load_monitor = LoadMonitor()
+    election_db = ElectionDatabase(profiler, load_monitor)
     helper = helper.APIHelper(election_db)
+    scheduler = ElectionScheduler(election_db)
+    scheduler.start()
+    rate_limit_backend = os.environ.get("RATE_LIMIT_BACKEND", "memory").lower()
+    if rate_limit_backend == "mongo":
+        rate_limit_store = MongoTokenBucketStore(election_db.db["rate_limit"])
+    elif rate_limit_backend == "none":
+        rate_limit_store = None
+    else:
+        rate_limit_store = MemoryTokenBucketStore()
+    limiter = RateLimiter(rate_limit_store, load_monitor)
+    limiter.init_app(app)
     app.run(
         host=os.environ.get("HOST", "0.0.0.0"),
         port=int(os.environ.get("PORT", 5000))
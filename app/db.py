@@ -1,19 +1,37 @@
+import contextlib
 import datetime
+import hashlib
+import json
 import logging
 import os
+from collections import Counter
 from typing import Any, Mapping, Optional
 
 import pymongo
 from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
 
-from election import get_election_result
+from election import count_ballots, get_election_result_from_ballot_counts
+from environment import parse_number_from_environment
+from monitor import LoadMonitor
+from profiler import Profiler
 
 
 class ElectionDatabase:
-    def __init__(self):
-        self.client = pymongo.MongoClient(os.environ["MONGO_URI"])
+    def __init__(self, profiler: Optional[Profiler] = None, load_monitor: Optional[LoadMonitor] = None):
+        self.profiler = profiler
+        self.load_monitor = load_monitor
+        self.client = pymongo.MongoClient(
+            os.environ["MONGO_URI"],
+            event_listeners=[load_monitor] if load_monitor is not None else []
+        )
         self.db = self.client["ranked_choice_voting"]
         self.election = self.db["election"]
+        self.result = self.db["result"]
+        self.ballot_archive = self.db["ballot_archive"]
+        self.archive_ballots = os.environ.get("ARCHIVE_BALLOTS", "false").lower() == "true"
+        self.streaming_tally = os.environ.get("STREAMING_TALLY", "false").lower() == "true"
+        self.tally_chunk_size = int(parse_number_from_environment("TALLY_CHUNK_SIZE", 10000))
         if "TTL_SECONDS" in os.environ:
             try:
                 seconds_to_expiry = int(os.environ["TTL_SECONDS"])
@@ -23,6 +41,8 @@ class ElectionDatabase:
                 seconds_to_expiry = 2592000
             logging.info(f"Setting TTL index to expire after {seconds_to_expiry} seconds")
             self.election.create_index("end_time", expireAfterSeconds=seconds_to_expiry)
+            self.result.create_index("end_time", expireAfterSeconds=seconds_to_expiry)
+            self.ballot_archive.create_index("end_time", expireAfterSeconds=seconds_to_expiry)
 
     def get_election_by_id(self, _id: str) -> Mapping[str, Any]:
         if ObjectId.is_valid(_id):
@@ -46,6 +66,8 @@ class ElectionDatabase:
         if ObjectId.is_valid(_id):
             _id = ObjectId(_id)
         self.election.delete_one({"_id": _id})
+        self.result.delete_one({"_id": _id})
+        self.ballot_archive.delete_one({"_id": _id})
 
     def check_duplicate_election_is_running(self, creator: str, candidates: list[str]) -> tuple[bool, Optional[str]]:
         elections_with_same_candidates_by_creator = (
@@ -57,6 +79,37 @@ class ElectionDatabase:
             _ids = ", ".join(_ids)
             return True, _ids
 
+    def calculate_election_result(
+            self,
+            candidates: list[str],
+            ballot_counts: Mapping[tuple[str, ...], int],
+            voting_strategy: str,
+            number_of_winners: int
+    ):
+        tally_function = get_election_result_from_ballot_counts
+        with self.load_monitor.track_tally() if self.load_monitor is not None else contextlib.nullcontext():
+            if self.profiler is None:
+                return tally_function(candidates, ballot_counts, voting_strategy, number_of_winners)
+            return self.profiler.profile_tally(
+                tally_function, candidates, ballot_counts, voting_strategy, number_of_winners)
+
+    def stream_ballot_counts(self, _id: str) -> Counter:
+        if ObjectId.is_valid(_id):
+            _id = ObjectId(_id)
+        # group identical ballots inside the database and read the counts back one chunk at a time
+        pipeline = [
+            {"$match": {"_id": _id}},
+            {"$project": {"ballots": {"$objectToArray": "$ballots"}}},
+            {"$unwind": "$ballots"},
+            {"$group": {"_id": "$ballots.v", "count": {"$sum": 1}}},
+        ]
+        ballot_counts = Counter()
+        cursor = self.election.aggregate(pipeline, allowDiskUse=True, batchSize=self.tally_chunk_size)
+        for ballot_count in cursor:
+            ballot_counts[tuple(ballot_count["_id"])] += ballot_count["count"]
+        logging.info(f"Streamed {len(ballot_counts)} distinct ballots for election {_id}")
+        return ballot_counts
+
     def add_ballot_to_election(self, _id: str, ip_address: str, ballot: list[str]):
         if ObjectId.is_valid(_id):
             _id = ObjectId(_id)
@@ -98,9 +151,9 @@ class ElectionDatabase:
         logging.info(f"Ballot added to database for election {_id} by {ip_address}")
 
         # calculate new winner
-        winning_candidates, number_of_rounds, election_result_string = get_election_result(
+        winning_candidates, number_of_rounds, election_result_string = self.calculate_election_result(
             candidates,
-            list(ballots.values()),
+            count_ballots(ballots.values()),
             voting_strategy,
             number_of_winners
         )
@@ -160,9 +213,9 @@ class ElectionDatabase:
 
         # calculate new winner
         if ballots is not None:
-            winning_candidates, number_of_rounds, election_result_string = get_election_result(
+            winning_candidates, number_of_rounds, election_result_string = self.calculate_election_result(
                 candidates,
-                list(ballots.values()),
+                count_ballots(ballots.values()),
                 voting_strategy,
                 number_of_winners
             )
@@ -199,3 +252,91 @@ class ElectionDatabase:
             "ballots": ""
         }})
         logging.info(f"Reset election results in database for election {_id}")
+
+    def get_elections_pending_finalization(self, current_time: datetime.datetime) -> list[Any]:
+        elections_past_end_time = self.election.find(
+            {"end_time": {"$lte": current_time}, "finalized": {"$ne": True}},
+            {"_id": 1}
+        )
+        return [election["_id"] for election in elections_past_end_time]
+
+    def get_election_snapshot(self, _id: str) -> Optional[Mapping[str, Any]]:
+        if ObjectId.is_valid(_id):
+            _id = ObjectId(_id)
+        return self.result.find_one({"_id": _id})
+
+    def finalize_election(self, _id: str):
+        if ObjectId.is_valid(_id):
+            _id = ObjectId(_id)
+        if self.streaming_tally:
+            election = self.election.find_one({"_id": _id}, {"ballots": 0})
+            if election is None:
+                raise Exception("This election does not exist")
+            ballot_counts = self.stream_ballot_counts(_id)
+        else:
+            election = self.get_election_by_id(_id)
+            ballot_counts = count_ballots((election.get("ballots", None) or {}).values())
+        snapshot_fields = [
+            "_id",
+            "name",
+            "description",
+            "creator",
+            "start_time",
+            "end_time",
+            "voting_strategy",
+            "number_of_winners",
+            "anonymous",
+            "update_ballot",
+            "candidates"
+        ]
+        snapshot = {field: election[field] for field in snapshot_fields if field in election}
+        snapshot["number_of_ballots"] = sum(ballot_counts.values())
+
+        # run one authoritative tally over the final set of ballots
+        if ballot_counts:
+            winning_candidates, number_of_rounds, election_result_string = self.calculate_election_result(
+                election["candidates"],
+                ballot_counts,
+                election["voting_strategy"],
+                election["number_of_winners"]
+            )
+            logging.info(f"Calculated final election results for election {_id}")
+            snapshot["winning_candidates"] = winning_candidates
+            snapshot["number_of_rounds"] = number_of_rounds
+            snapshot["summary"] = election_result_string
+
+            # store identical ballots once along with their count, without voter IP addresses
+            snapshot["ballot_counts"] = [
+                {"ballot": list(ballot), "count": count} for ballot, count in ballot_counts.most_common()
+            ]
+
+        snapshot["finalized_time"] = datetime.datetime.utcnow()
+        snapshot["etag"] = hashlib.sha256(json.dumps(snapshot, default=str, sort_keys=True).encode()).hexdigest()
+
+        # snapshots are insert-only, so a concurrent finalization of the same election is a no-op
+        try:
+            self.result.insert_one(snapshot)
+            logging.info(f"Stored result snapshot for election {_id}")
+        except DuplicateKeyError:
+            logging.warning(f"Result snapshot for election {_id} already exists")
+
+        if ballot_counts:
+            self.election.update_one({"_id": _id}, {"$set": {
+                "finalized": True,
+                "winning_candidates": snapshot["winning_candidates"],
+                "number_of_rounds": snapshot["number_of_rounds"],
+                "summary": snapshot["summary"]
+            }})
+        else:
+            self.election.update_one({"_id": _id}, {"$set": {"finalized": True}})
+        logging.info(f"Marked election {_id} as finalized")
+
+        # move raw ballots out of the election document without reading them into the app
+        if ballot_counts and self.archive_ballots:
+            self.election.aggregate([
+                {"$match": {"_id": _id}},
+                {"$project": {"end_time": 1, "ballots": 1}},
+                {"$merge": {"into": self.ballot_archive.name, "whenMatched": "replace"}},
+            ])
+            self.election.update_one({"_id": _id}, {"$unset": {"ballots": ""}})
+            logging.info(f"Archived ballots for election {_id}")
@@ -1,5 +1,6 @@
 import logging
-from typing import Union
+from collections import Counter
+from typing import Iterable, Mapping, Union
 
 import pyrankvote
 from pyrankvote import Candidate, Ballot
@@ -16,22 +17,35 @@ def format_candidates_and_ballots_for_voting(candidates: list[str], ballots: lis
     return candidates, ballots
 
 
-def get_election_result(
-        candidates: list[Union[str, Candidate]],
-        ballots: list[Union[list[str], Ballot]],
+def count_ballots(ballots: Iterable[list[str]]) -> Counter:
+    return Counter(tuple(ballot) for ballot in ballots)
+
+
+def format_ballot_counts_for_voting(candidates: list[str], ballot_counts: Mapping[tuple[str, ...], int]) -> \
+        tuple[list[Candidate], list[Ballot]]:
+    candidates = list(map(lambda x: Candidate(x), candidates))
+    candidates_by_name = {candidate.name: candidate for candidate in candidates}
+    ballots = []
+    for ranked_candidates, count in ballot_counts.items():
+        # identical ballots share a single Ballot object, but the list still holds one reference per voter
+        ballot = Ballot(ranked_candidates=[candidates_by_name[x] for x in ranked_candidates])
+        ballots.extend([ballot] * count)
+    return candidates, ballots
+
+
+def compute_election_result(
+        candidates: list[Candidate],
+        ballots: list[Ballot],
         voting_strategy: str = "instant_runoff",
         number_of_winners: int = 1
 ):
-    logging.info(f"Computing election result for candidates: {candidates} and ballots: {ballots}"
-                 f"with voting strategy: {voting_strategy} and number of winners: {number_of_winners}")
-    candidates, ballots = format_candidates_and_ballots_for_voting(candidates, ballots)
     voting_strategies = {
         "instant_runoff": pyrankvote.instant_runoff_voting,
         "preferential_block": pyrankvote.preferential_block_voting,
         "single_transferable": pyrankvote.single_transferable_vote,
     }
     voting_strategy_function = voting_strategies.get(voting_strategy, None)
-    if voting_strategy is None:
+    if voting_strategy_function is None:
         raise ValueError(f"Invalid voting strategy: {voting_strategy}")
 
     if voting_strategy == "instant_runoff":
@@ -49,3 +63,27 @@ def get_election_result(
     number_of_rounds = len(election_result.rounds)
     election_result_string = str(election_result)
     return winning_candidates, number_of_rounds, election_result_string
+
+
+def get_election_result(
+        candidates: list[Union[str, Candidate]],
+        ballots: list[Union[list[str], Ballot]],
+        voting_strategy: str = "instant_runoff",
+        number_of_winners: int = 1
+):
+    logging.info(f"Computing election result for candidates: {candidates} and ballots: {ballots}"
+                 f"with voting strategy: {voting_strategy} and number of winners: {number_of_winners}")
+    candidates, ballots = format_candidates_and_ballots_for_voting(candidates, ballots)
+    return compute_election_result(candidates, ballots, voting_strategy, number_of_winners)
+
+
+def get_election_result_from_ballot_counts(
+        candidates: list[str],
+        ballot_counts: Mapping[tuple[str, ...], int],
+        voting_strategy: str = "instant_runoff",
+        number_of_winners: int = 1
+):
+    logging.info(f"Computing election result for candidates: {candidates} and {len(ballot_counts)} distinct ballots "
+                 f"with voting strategy: {voting_strategy} and number of winners: {number_of_winners}")
+    candidates, ballots = format_ballot_counts_for_voting(candidates, ballot_counts)
+    return compute_election_result(candidates, ballots, voting_strategy, number_of_winners)
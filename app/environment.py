@@ -0,0 +1,13 @@
+import logging
+import os
+from typing import Optional
+
+
+def parse_number_from_environment(variable: str, default: Optional[float] = None) -> Optional[float]:
+    if variable not in os.environ:
+        return default
+    try:
+        return float(os.environ[variable])
+    except ValueError:
+        logging.warning(f"Invalid {variable} value: {os.environ[variable]}. Using default value of {default}")
+        return default
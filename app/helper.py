@@ -105,6 +105,9 @@ class APIHelper:
 
     def update_election_with_new_data(self, election: dict[str, Any], data: dict[str, Any]) -> dict[str, Any]:
         logging.info(f"Updating election: {election['_id']} with new data: {data}")
+        if election.get("finalized", False):
+            raise Exception("Election has ended and its results have been finalized. It can no longer be updated")
+
         fields_requiring_election_result_reset = [
             "candidates",
             "voting_strategy",
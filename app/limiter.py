@@ -0,0 +1,139 @@
+import datetime
+import logging
+import math
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Union
+
+import flask
+from flask import jsonify
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+
+import helper
+from environment import parse_number_from_environment
+from monitor import LoadMonitor
+
+
+class MemoryTokenBucketStore:
+    def __init__(self, max_buckets: int = 100000):
+        # buckets hold their tokens and when they were last updated, ordered from least to most recently used
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+
+    def consume(self, key: str, capacity: float, refill_rate: float) -> float:
+        current_time = time.monotonic()
+        with self.lock:
+            tokens, updated_time = self.buckets.get(key, (capacity, current_time))
+            tokens = min(capacity, tokens + (current_time - updated_time) * refill_rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / refill_rate
+            self.buckets[key] = (tokens, current_time)
+            self.buckets.move_to_end(key)
+            # evict the least recently used buckets, which are the most likely to have refilled completely
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        return retry_after
+
+
+class MongoTokenBucketStore:
+    def __init__(self, collection: Collection):
+        self.collection = collection
+        self.collection.create_index("expire_time", expireAfterSeconds=0)
+
+    def consume(self, key: str, capacity: float, refill_rate: float) -> float:
+        current_time = time.time()
+        # refill and consume in a single atomic update so every app instance shares the same bucket
+        bucket = self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [capacity, {"$add": [
+                        {"$ifNull": ["$tokens", capacity]},
+                        {"$multiply": [
+                            {"$max": [0, {"$subtract": [current_time, {"$ifNull": ["$updated_time", current_time]}]}]},
+                            refill_rate
+                        ]}
+                    ]}]},
+                    "updated_time": current_time,
+                    "expire_time": datetime.datetime.utcnow() + datetime.timedelta(seconds=capacity / refill_rate),
+                }},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / refill_rate
+
+
+class RateLimiter:
+    def __init__(self, store: Union[MemoryTokenBucketStore, MongoTokenBucketStore, None], load_monitor: LoadMonitor):
+        self.store = store
+        self.load_monitor = load_monitor
+        self.load_shed_retry_after = int(parse_number_from_environment("LOAD_SHED_RETRY_AFTER_SECONDS", 5))
+
+        # budgets are given as "<requests>/<seconds>" and keyed by the endpoint they apply to
+        route_budgets = {
+            "add_election": ("RATE_LIMIT_ADD_ELECTION", "10/60"),
+            "add_vote": ("RATE_LIMIT_ADD_VOTE", "60/60"),
+        }
+        self.budgets: dict[str, tuple[float, float]] = {}
+        for endpoint, (variable, default) in route_budgets.items():
+            budget = os.environ.get(variable, default)
+            try:
+                requests, seconds = map(float, budget.split("/"))
+                self.budgets[endpoint] = (requests, requests / seconds)
+            except (ValueError, ZeroDivisionError):
+                logging.warning(f"Invalid {variable} value: {budget}. Using default value of {default}")
+                requests, seconds = map(float, default.split("/"))
+                self.budgets[endpoint] = (requests, requests / seconds)
+
+    def check_request(self):
+        request = flask.request
+        if request.endpoint not in self.budgets:
+            return None
+
+        if (reason := self.load_monitor.get_overload_reason()) is not None:
+            logging.warning(f"Shedding request to {request.endpoint} because {reason}")
+            output = {
+                "status": False,
+                "message": "The server is overloaded. Please try again later.",
+            }
+            return jsonify(output), 503, {"Retry-After": str(self.load_shed_retry_after)}
+
+        if self.store is None:
+            return None
+
+        ip_address = helper.APIHelper.get_request_ip_address(request)
+        capacity, refill_rate = self.budgets[request.endpoint]
+        try:
+            retry_after = self.store.consume(f"{request.endpoint}:{ip_address}", capacity, refill_rate)
+        except Exception as e:
+            # rate limiting must not take the API down with it, so let the request through
+            stacktrace = traceback.format_exc()
+            logging.error(f"Error in checking rate limit for {ip_address}: {e}: {stacktrace}")
+            return None
+
+        if retry_after > 0:
+            logging.warning(f"Rate limit exceeded for {request.endpoint} by {ip_address}")
+            output = {
+                "status": False,
+                "message": "Too many requests. Please try again later.",
+            }
+            return jsonify(output), 429, {"Retry-After": str(math.ceil(retry_after))}
+        return None
+
+    def init_app(self, app: flask.Flask):
+        app.before_request(self.check_request)
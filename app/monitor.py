@@ -0,0 +1,74 @@
+import contextlib
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from pymongo.monitoring import CommandFailedEvent, CommandListener, CommandStartedEvent, CommandSucceededEvent
+
+from environment import parse_number_from_environment
+
+
+class LoadMonitor(CommandListener):
+    def __init__(self):
+        self.max_tallies = parse_number_from_environment("LOAD_SHED_MAX_TALLIES")
+        self.max_db_latency_ms = parse_number_from_environment("LOAD_SHED_DB_LATENCY_MS")
+        self.min_latency_samples = int(parse_number_from_environment("LOAD_SHED_MIN_SAMPLES", 20))
+        self.latency_window_seconds = 10
+        # long-running aggregations from finalization and streaming tallies do not reflect request latency
+        self.ignored_commands = {"aggregate", "getMore"}
+        self.latency_samples: deque[tuple[float, float]] = deque()
+        self.total_latency_ms = 0.0
+        self.tallies_in_progress = 0
+        self.lock = threading.Lock()
+
+    def remove_old_latency_samples(self, current_time: float):
+        while self.latency_samples and current_time - self.latency_samples[0][0] > self.latency_window_seconds:
+            _, duration_ms = self.latency_samples.popleft()
+            self.total_latency_ms -= duration_ms
+        if not self.latency_samples:
+            self.total_latency_ms = 0.0
+
+    def record_db_latency(self, command_name: str, duration_micros: int):
+        if command_name in self.ignored_commands:
+            return
+        current_time = time.monotonic()
+        duration_ms = duration_micros / 1000
+        with self.lock:
+            self.latency_samples.append((current_time, duration_ms))
+            self.total_latency_ms += duration_ms
+            self.remove_old_latency_samples(current_time)
+
+    def started(self, event: CommandStartedEvent):
+        pass
+
+    def succeeded(self, event: CommandSucceededEvent):
+        self.record_db_latency(event.command_name, event.duration_micros)
+
+    def failed(self, event: CommandFailedEvent):
+        self.record_db_latency(event.command_name, event.duration_micros)
+
+    @contextlib.contextmanager
+    def track_tally(self):
+        with self.lock:
+            self.tallies_in_progress += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.tallies_in_progress -= 1
+
+    def get_overload_reason(self) -> Optional[str]:
+        with self.lock:
+            if self.max_tallies is not None and self.tallies_in_progress >= self.max_tallies:
+                return f"{self.tallies_in_progress} election results are already being calculated"
+            if self.max_db_latency_ms is None:
+                return None
+            # a handful of slow commands is not enough evidence to reject requests
+            self.remove_old_latency_samples(time.monotonic())
+            if len(self.latency_samples) < self.min_latency_samples:
+                return None
+            db_latency_ms = self.total_latency_ms / len(self.latency_samples)
+            if db_latency_ms > self.max_db_latency_ms:
+                return f"average database latency is {db_latency_ms:.2f} ms"
+        return None
@@ -0,0 +1,207 @@
+import cProfile
+import datetime
+import hmac
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Mapping, Optional, Union
+
+import flask
+
+from environment import parse_number_from_environment
+
+
+class Profiler:
+    def __init__(self):
+        self.profile_dir = os.environ.get("PROFILE_DIR", "profiles")
+        self.profile_token = os.environ.get("PROFILE_TOKEN", None)
+        self.request_threshold_ms = parse_number_from_environment("PROFILE_REQUEST_THRESHOLD_MS", None)
+        self.request_sample_rate = parse_number_from_environment("PROFILE_REQUEST_SAMPLE_RATE", 1.0)
+        self.tally_threshold_ms = parse_number_from_environment("PROFILE_TALLY_THRESHOLD_MS", None)
+        self.tally_sample_rate = parse_number_from_environment("PROFILE_TALLY_SAMPLE_RATE", 1.0)
+        self.max_files = int(parse_number_from_environment("PROFILE_MAX_FILES", 100))
+        self.local = threading.local()
+        self.profile_lock = threading.Lock()
+        self.retention_lock = threading.Lock()
+
+    def check_profile_token(self, request: flask.Request) -> bool:
+        if self.profile_token is None:
+            return False
+        return hmac.compare_digest(request.headers.get("X-Profile-Token", "").encode(), self.profile_token.encode())
+
+    def start_request_profile(self):
+        request = flask.request
+        # listing profiles needs the profile token, which should not also capture a profile of the listing
+        if request.endpoint == "view_profiles":
+            return
+
+        requested = self.check_profile_token(request)
+        sampled = self.request_threshold_ms is not None and random.random() < self.request_sample_rate
+        if not requested and not sampled:
+            return
+
+        profile = self.start_profile()
+        if profile is None:
+            if requested:
+                logging.warning(f"Unable to profile requested {request.method} {request.path} "
+                                f"because another profile is running")
+            return
+
+        self.local.requested = requested
+        self.local.slow_tally = False
+        self.local.tallies = []
+        self.local.start_time = time.perf_counter()
+        self.local.profile = profile
+
+    def stop_request_profile(self, response: flask.Response) -> flask.Response:
+        profile = getattr(self.local, "profile", None)
+        if profile is None:
+            return response
+
+        self.stop_profile(profile)
+        self.local.profile = None
+        duration_ms = (time.perf_counter() - self.local.start_time) * 1000
+        if self.local.requested or self.local.slow_tally or duration_ms >= self.request_threshold_ms:
+            request = flask.request
+            self.dump_profile(profile, "request", duration_ms, {
+                "method": request.method,
+                "path": request.path,
+                "status_code": response.status_code,
+                "requested": self.local.requested,
+                "tallies": self.local.tallies,
+            })
+        return response
+
+    def discard_request_profile(self, exception: Optional[BaseException] = None):
+        profile = getattr(self.local, "profile", None)
+        if profile is not None:
+            self.stop_profile(profile)
+            self.local.profile = None
+
+    def start_profile(self) -> Optional[cProfile.Profile]:
+        # Python 3.12+ allows only one active profiler per process, so skip profiling while another one runs
+        if not self.profile_lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            self.profile_lock.release()
+            logging.warning(f"Unable to start profiler: {e}")
+            return None
+        return profile
+
+    def stop_profile(self, profile: cProfile.Profile):
+        try:
+            profile.disable()
+        finally:
+            self.profile_lock.release()
+
+    def init_app(self, app: flask.Flask):
+        app.before_request(self.start_request_profile)
+        app.after_request(self.stop_request_profile)
+        app.teardown_request(self.discard_request_profile)
+
+    def profile_tally(
+            self,
+            tally_function: Callable,
+            candidates: list[str],
+            ballots: Union[list[list[str]], Mapping[tuple[str, ...], int]],
+            voting_strategy: str,
+            number_of_winners: int
+    ):
+        election_shape = {
+            "number_of_ballots": sum(ballots.values()) if isinstance(ballots, Mapping) else len(ballots),
+            "number_of_candidates": len(candidates),
+            "voting_strategy": voting_strategy,
+            "number_of_winners": number_of_winners,
+        }
+
+        # a request profile is already recording this thread, so note the tally against it
+        # and make sure the request profile is saved if the tally is slow
+        if getattr(self.local, "profile", None) is not None:
+            start_time = time.perf_counter()
+            result = tally_function(candidates, ballots, voting_strategy, number_of_winners)
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            election_shape["duration_ms"] = duration_ms
+            self.local.tallies.append(election_shape)
+            if self.tally_threshold_ms is not None and duration_ms >= self.tally_threshold_ms:
+                logging.warning(f"Slow election tally took {duration_ms:.2f} ms: {election_shape}")
+                self.local.slow_tally = True
+            return result
+
+        if self.tally_threshold_ms is None:
+            return tally_function(candidates, ballots, voting_strategy, number_of_winners)
+
+        # profiling slows the tally down, so only a sample of tallies is profiled
+        profile = self.start_profile() if random.random() < self.tally_sample_rate else None
+        start_time = time.perf_counter()
+        try:
+            result = tally_function(candidates, ballots, voting_strategy, number_of_winners)
+        finally:
+            if profile is not None:
+                self.stop_profile(profile)
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        if duration_ms >= self.tally_threshold_ms:
+            if profile is None:
+                logging.warning(f"Slow election tally took {duration_ms:.2f} ms but was not profiled "
+                                f"because it was not sampled or another profile was running: {election_shape}")
+                return result
+            logging.warning(f"Slow election tally took {duration_ms:.2f} ms: {election_shape}")
+            self.dump_profile(profile, "tally", duration_ms, election_shape)
+        return result
+
+    def dump_profile(self, profile: cProfile.Profile, kind: str, duration_ms: float, details: dict[str, Any]):
+        current_time = datetime.datetime.utcnow()
+        name = f"{current_time.strftime('%Y%m%d%H%M%S%f')}-{kind}-{uuid.uuid4().hex[:8]}"
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+            metadata = {
+                "name": name,
+                "kind": kind,
+                "created_time": current_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "duration_ms": round(duration_ms, 3),
+                "profile": f"{name}.prof",
+                **details,
+            }
+            # write to a temporary file first so a listing never reads a partly written description
+            temporary_path = os.path.join(self.profile_dir, f".{name}.json.tmp")
+            with open(temporary_path, "w") as f:
+                json.dump(metadata, f)
+            os.replace(temporary_path, os.path.join(self.profile_dir, f"{name}.json"))
+            logging.info(f"Saved {kind} profile {name} taking {duration_ms:.2f} ms")
+            self.remove_old_profiles()
+        except Exception as e:
+            logging.error(f"Error in saving {kind} profile {name}: {e}")
+
+    def remove_old_profiles(self):
+        with self.retention_lock:
+            # profile names start with their creation time, so sorting them puts the oldest first
+            names = sorted(file_name[:-len(".json")] for file_name in os.listdir(self.profile_dir)
+                           if file_name.endswith(".json"))
+            for name in names[:max(0, len(names) - self.max_files)]:
+                for extension in [".json", ".prof"]:
+                    try:
+                        os.remove(os.path.join(self.profile_dir, f"{name}{extension}"))
+                    except FileNotFoundError:
+                        pass
+                logging.info(f"Removed old profile {name}")
+
+    def list_profiles(self) -> list[dict[str, Any]]:
+        if not os.path.isdir(self.profile_dir):
+            return []
+        profiles = []
+        for file_name in os.listdir(self.profile_dir):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.profile_dir, file_name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logging.warning(f"Skipping unreadable profile {file_name}: {e}")
+        return sorted(profiles, key=lambda x: x["name"], reverse=True)
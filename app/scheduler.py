@@ -0,0 +1,46 @@
+import datetime
+import logging
+import threading
+import traceback
+
+from db import ElectionDatabase
+from environment import parse_number_from_environment
+
+
+class ElectionScheduler:
+    def __init__(self, election_db: ElectionDatabase):
+        self.election_db = election_db
+        self.interval_seconds = parse_number_from_environment("FINALIZATION_INTERVAL_SECONDS", 60)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="election-scheduler", daemon=True)
+
+    def start(self):
+        logging.info(f"Starting election scheduler with an interval of {self.interval_seconds} seconds")
+        self.thread.start()
+
+    def stop(self):
+        logging.info("Stopping election scheduler")
+        self.stop_event.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.finalize_ended_elections()
+            self.stop_event.wait(self.interval_seconds)
+
+    def finalize_ended_elections(self):
+        current_time = datetime.datetime.utcnow()
+        try:
+            _ids = self.election_db.get_elections_pending_finalization(current_time)
+        except Exception as e:
+            stacktrace = traceback.format_exc()
+            logging.error(f"Error in fetching elections pending finalization: {e}: {stacktrace}")
+            return
+
+        for _id in _ids:
+            try:
+                logging.info(f"Finalizing election with ID: {_id}")
+                self.election_db.finalize_election(_id)
+            except Exception as e:
+                stacktrace = traceback.format_exc()
+                logging.error(f"Error in finalizing election - {_id}: {e}: {stacktrace}")